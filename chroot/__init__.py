@@ -7,31 +7,115 @@
 
 import os
 from os.path import abspath, join, realpath
+import ctypes
+import errno
+import fcntl
+import functools
+import re
 import shlex
+import shutil
 import subprocess
 from contextlib import contextmanager
+from types import MappingProxyType
 
-from typing import Dict, Optional, Union, TypeVar, Generator, List, Any
+from typing import (
+        Dict, FrozenSet, Optional, Tuple, TypeVar, Generator, List, Sequence,
+        Union, Any, Iterable, Mapping, NamedTuple)
 
 AnyPath = TypeVar('AnyPath', str, os.PathLike)
 
-MNT_DEFAULT = {
+# MountSpec kinds
+MOUNT_BIND = 0  # bind mount host directory `source`
+MOUNT_TYPE = 1  # mount a new filesystem of type `source`
+
+
+class MountSpec(NamedTuple):
+    '''a single entry of a compiled mount profile'''
+    kind: int
+    source: str
+    target_sub: str
+
+
+# mount profiles are read-only so they can't drift from the pre-compiled
+# specs below; copy one (e.g. `dict(MNT_FULL)`) to build a custom profile
+MNT_DEFAULT = MappingProxyType({
         # Mounts 'devpts' and 'proc' type mounts into the chroot
         'switch': '-t',  # use '-t' (type) switch with mount
         'proc' : 'proc',  # label/mount_type: mount_point
-        'devpts': 'dev/pts'}
+        'devpts': 'dev/pts'})
 
-MNT_FULL = {
+MNT_FULL = MappingProxyType({
         # Bind mounts /dev, /sys, /proc & /run into the chroot
         'switch': '-o',  # use '-o (bind)' (option) switch with mount
         'proc': 'proc',  # label/host_mount: mount_point
         'dev': 'dev',
         'sys': 'sys',
-        'run': 'run'}
+        'run': 'run'})
+
+# MNT_DEFAULT & MNT_FULL pre-compiled into MountSpec tuples
+_DEFAULT_SPEC = (
+        MountSpec(MOUNT_TYPE, 'proc', 'proc'),
+        MountSpec(MOUNT_TYPE, 'devpts', 'dev/pts'))
+_FULL_SPEC = (
+        MountSpec(MOUNT_BIND, 'proc', 'proc'),
+        MountSpec(MOUNT_BIND, 'dev', 'dev'),
+        MountSpec(MOUNT_BIND, 'sys', 'sys'),
+        MountSpec(MOUNT_BIND, 'run', 'run'))
+
+_BASE_ENV = {
+        'HOME': '/root',
+        'LC_ALL': 'C',
+        'PATH': "/usr/local/sbin:/usr/local/bin:/sbin:/bin:/usr/bin:/usr/sbin"}
+# fall back to a terminal type which makes no assumptions about capabilities
+_BASE_ENV.setdefault('TERM', os.environ.get('TERM', 'dumb'))
+
+# resolved once, so running a command doesn't have to search PATH for chroot
+# (chroot commands are run with the PATH above)
+_CHROOT_BIN = (shutil.which('chroot', path=_BASE_ENV['PATH'])
+               or '/usr/sbin/chroot')
+
+# serialises mounting between turnkey-chroot instances
+# (in /run itself rather than the world-writable /run/lock, so unprivileged
+# users can't create and hold it)
+LOCK_PATH = '/run/turnkey-chroot.lock'
+
+# shell operators which aren't supported in commands passed to Chroot.run
+_FORBIDDEN = frozenset(('>', '<', '|'))
+
+# characters which need quoting for the shell (as shlex.quote); NUL is used
+# to join arguments before searching them all at once
+_find_unsafe = re.compile(r'[^\w@%+=:,./\x00-]', re.ASCII).search
+
+MS_BIND = 4096  # from <sys/mount.h>
+MNT_FORCE = 1
+MNT_DETACH = 2
+
+# the C library is already loaded into the interpreter, so resolve its symbols
+# from the running process rather than by (glibc specific) soname
+_libc = ctypes.CDLL(None, use_errno=True)
+_libc.mount.argtypes = [ctypes.c_char_p] * 3 + [ctypes.c_ulong, ctypes.c_void_p]
+_libc.mount.restype = ctypes.c_int
+_libc.umount2.argtypes = [ctypes.c_char_p, ctypes.c_int]
+_libc.umount2.restype = ctypes.c_int
+_libc.syscall.restype = ctypes.c_long
+
+SYS_openat2 = 437  # same number on all architectures (except alpha)
+RESOLVE_NO_XDEV = 0x01
+
+
+class _OpenHow(ctypes.Structure):
+    # struct open_how from <linux/openat2.h>
+    _fields_ = [
+        ('flags', ctypes.c_uint64),
+        ('mode', ctypes.c_uint64),
+        ('resolve', ctypes.c_uint64)]
+
+
+_DEBUG = bool(os.getenv('TKL_CHROOT_DEBUG', ''))
 
 
 def debug(*s: Any) -> None:
-    if os.getenv('TKL_CHROOT_DEBUG', ''):
+    if _DEBUG:
         print(*s)
 
 
@@ -43,6 +127,111 @@ class MountError(ChrootError):
     pass
 
 
+@functools.lru_cache(maxsize=128)
+def _resolve(path: str) -> str:
+    ''' cached `realpath`, so repeatedly creating chroots for the same target
+    doesn't walk the filesystem each time (use `_resolve.cache_clear()` if a
+    target is moved) '''
+    return realpath(path)
+
+
+def _escape_mount_path(path: bytes) -> bytes:
+    ''' escape a path the way the kernel does in /proc/mounts (space, tab,
+    newline and backslash are written as octal escapes)
+    '''
+    return (path.replace(b'\\', b'\\134').replace(b' ', b'\\040')
+                .replace(b'\t', b'\\011').replace(b'\n', b'\\012'))
+
+
+def _read_proc_mounts() -> bytes:
+    ''' returns the raw contents of /proc/mounts '''
+    with open('/proc/mounts', 'rb') as fob:
+        return fob.read()
+
+
+def _snapshot_mounts() -> FrozenSet[bytes]:
+    ''' returns the set of all mount points currently listed in /proc/mounts,
+    as raw (kernel-escaped) bytes; see `_escape_mount_path`.
+
+    Reading the table once and testing membership avoids re-scanning it for
+    every path we need to check.
+    '''
+    return frozenset([
+            line.split(b' ', 2)[1]
+            for line in _read_proc_mounts().splitlines()])
+
+
+def _ctypes_mount(
+        source: bytes, target: bytes, fstype: Optional[bytes], flags: int
+) -> int:
+    ''' mount(2) via ctypes, returns 0 or an errno value '''
+    if _libc.mount(source, target, fstype, flags, None) != 0:
+        return ctypes.get_errno()
+    return 0
+
+
+def _ctypes_umount2(target: bytes, flags: int) -> int:
+    ''' umount2(2) via ctypes, returns 0 or an errno value '''
+    if _libc.umount2(target, flags) != 0:
+        return ctypes.get_errno()
+    return 0
+
+
+def _ctypes_probe_mount_point(path: bytes) -> Optional[bool]:
+    ''' check whether an absolute, normalised path is a mount point using a
+    single openat2(2) call, which fails with EXDEV when RESOLVE_NO_XDEV is set
+    and the last path component crosses into another mount.
+
+    Returns:
+        True/False, or None if openat2 isn't available (old kernel or
+        blocked by seccomp) and the caller needs to fall back to reading
+        /proc/mounts
+    '''
+    parent, base = os.path.split(path)
+    if not base:
+        return True  # '/'
+    try:
+        dirfd = os.open(parent, os.O_PATH | os.O_DIRECTORY | os.O_CLOEXEC)
+    except (FileNotFoundError, NotADirectoryError):
+        return False
+    except OSError as e:
+        # e.g. EACCES or ELOOP, let the caller check /proc/mounts instead
+        debug('chroot._probe_mount_point =>', path, e.strerror)
+        return None
+    try:
+        how = _OpenHow(os.O_PATH | os.O_NOFOLLOW | os.O_CLOEXEC, 0,
+                       RESOLVE_NO_XDEV)
+        fd = _libc.syscall(
+                ctypes.c_long(SYS_openat2), ctypes.c_int(dirfd),
+                ctypes.c_char_p(base), ctypes.byref(how),
+                ctypes.c_size_t(ctypes.sizeof(how)))
+        if fd >= 0:
+            os.close(fd)
+            return False
+        err = ctypes.get_errno()
+    finally:
+        os.close(dirfd)
+    if err == errno.EXDEV:
+        return True
+    if err in (errno.ENOENT, errno.ENOTDIR):
+        return False
+    debug('chroot._probe_mount_point =>', path, os.strerror(err))
+    return None
+
+
+# the optional C extension provides the same primitives without the
+# per-call ctypes argument marshalling
+try:
+    from ._fast import (  # type: ignore
+            mount as _sys_mount,
+            umount2 as _sys_umount2,
+            probe_mount_point as _probe_mount_point)
+except ImportError:
+    _sys_mount = _ctypes_mount
+    _sys_umount2 = _ctypes_umount2
+    _probe_mount_point = _ctypes_probe_mount_point
+
+
 def is_mounted(path: AnyPath) -> bool:
     ''' determines if a given path is currently mounted.
 
@@ -50,22 +239,119 @@ def is_mounted(path: AnyPath) -> bool:
     os.PathLike interface, this includes `str`, `bytes` and path objects
     provided by `pathlib` in the standard library.
     '''
-    raw_path: Union[str, bytes] = os.fspath(path)
-    mode = 'rb' if isinstance(raw_path, bytes) else 'r'
-    sep = b' ' if isinstance(raw_path, bytes) else ' '
-    with open('/proc/mounts', mode) as fob:
-        for line in fob:
-            host, guest, *others = line.split(sep)
-            if guest == path:
-                return True
-    return False
+    raw_path = os.fsencode(path)
+    if not raw_path.startswith(b'/'):
+        # mount points are always listed as absolute paths
+        return False
+    # drop trailing slashes (& the like) so '/proc/' matches '/proc'
+    raw_path = os.path.normpath(raw_path)
+    probed = _probe_mount_point(raw_path)
+    if probed is not None:
+        return probed
+    data = _read_proc_mounts()
+    # the mount point is the only field which is preceded by a space and
+    # starts with a '/', so a substring search is enough
+    return b' ' + _escape_mount_path(raw_path) + b' ' in data
+
+
+def _mount(
+        source: str, target: str, fstype: Optional[str], flags: int
+) -> bool:
+    ''' mount a filesystem by calling mount(2) directly, avoiding the cost of
+    spawning a `mount` process per call.
+
+    Returns:
+        True if the filesystem was mounted, False if the kernel reported the
+        target as busy (i.e. something else mounted it in the meantime)
+
+    Raises:
+        MountError: mount(2) failed
+    '''
+    debug('chroot._mount =>', source, target, fstype, flags)
+    err = _sys_mount(
+            os.fsencode(source), os.fsencode(target),
+            None if fstype is None else os.fsencode(fstype),
+            flags)
+    if err:
+        if err == errno.EBUSY:
+            return False
+        raise MountError(err, f'failed to mount {source!r} on {target!r}: '
+                              f'{os.strerror(err)}')
+    return True
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_profile(
+        profile: Tuple[Tuple[str, str], ...]
+) -> Tuple[MountSpec, ...]:
+    ''' compile the items of a mount profile dict (see `MNT_DEFAULT`) into
+    `MountSpec` tuples
+
+    Raises:
+        MountError: the profile has an unknown switch
+    '''
+    items = dict(profile)
+    switch = items.pop('switch', None)
+    if switch not in ('-o', '-t'):
+        raise MountError(
+                f"Unknown switch passed to mount() method: '{switch}'.")
+    kind = MOUNT_BIND if switch == '-o' else MOUNT_TYPE
+    return tuple(
+            MountSpec(kind, name, mnt_point)
+            for name, mnt_point in items.items())
+
+
+def _shell_join(commands: Sequence[str]) -> str:
+    ''' equivalent to `shlex.join`, but when no argument needs quoting
+    (the common case) checks them with a single regex search '''
+    if all(commands) and _find_unsafe('\0'.join(commands)) is None:
+        return ' '.join(commands)
+    return shlex.join(commands)
+
+
+@functools.singledispatch
+def _command_argv(command: Iterable[str]) -> List[str]:
+    ''' convert a command passed to `Chroot.run` into an argv list; any
+    iterable of arguments is accepted '''
+    return list(command)
+
+
+@_command_argv.register
+def _(command: list) -> List[str]:
+    return command
+
+
+@_command_argv.register
+def _(command: str) -> List[str]:
+    # a string is split into arguments, it is *not* passed to a shell
+    return shlex.split(command)
+
+
+@contextmanager
+def _mount_lock() -> Generator[None, None, None]:
+    ''' hold an exclusive lock on `LOCK_PATH`, so that other turnkey-chroot
+    processes can't mount a chroot between our /proc/mounts snapshot and the
+    mounts which depend on it '''
+    try:
+        fd = os.open(
+                LOCK_PATH,
+                os.O_WRONLY | os.O_CREAT | os.O_NOFOLLOW | os.O_CLOEXEC, 0o644)
+    except FileNotFoundError:
+        debug('chroot._mount_lock => no lock directory, mounting unlocked')
+        yield
+        return
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
 
 
 @contextmanager
 def mount(
         target: os.PathLike,
         environ: Optional[Dict[str, str]] = None,
-        mnt_profile: Optional[Dict[str, str]] = None
+        mnt_profile: Optional[Mapping[str, str]] = None
 ) -> Generator['Chroot', None, None]:
     '''magic mount context manager
 
@@ -80,10 +366,12 @@ def mount(
         target: either a `MagicMounts` object or a path
 
     Yields:
-        a `Chroot` object representing a mounted chroot at the given location
+        a `Chroot` object representing a mounted chroot at the given location,
+        which is un-mounted again when the context exits
 
     '''
-    yield Chroot(target, environ, mnt_profile)
+    with Chroot(target, environ, mnt_profile) as chroot:
+        yield chroot
 
 
 class MagicMounts:
@@ -91,18 +379,37 @@ class MagicMounts:
 
     You *probably* don't want to use this object directly but rather the `mount`
     context manager, or the `Chroot` object.
-    '''
-    def __init__(self, mnt_profile: Dict[str, str], root: str = "/"):
-        root = os.fspath(abspath(root))
 
-        self.profile = mnt_profile
+    Mounts are not released automatically when this object is garbage
+    collected; call `umount` or use it as a context manager.
 
-        self.path: Dict[str, str] = {}
-        self.mounted: Dict[str, str] = {}
-        for k, v in self.profile.items():
-            if k != 'switch':
-                self.path[k] = join(root, v)
-                self.mounted[k] = False
+    `root` must be an absolute path, it is used as given (`Chroot` passes its
+    already resolved path).
+    '''
+    def __init__(
+            self, mnt_profile: Optional[Mapping[str, str]] = None,
+            root: str = "/"):
+        root = os.fspath(root)
+
+        if mnt_profile is None or mnt_profile is MNT_DEFAULT:
+            self.profile = MNT_DEFAULT
+            self._spec = _DEFAULT_SPEC
+        elif mnt_profile is MNT_FULL:
+            self.profile = MNT_FULL
+            self._spec = _FULL_SPEC
+        else:
+            self.profile = mnt_profile
+            self._spec = _compile_profile(tuple(mnt_profile.items()))
+
+        self.path: Dict[str, str] = {
+                spec.source: join(root, spec.target_sub)
+                for spec in self._spec}
+        self.mounted: Dict[str, bool] = dict.fromkeys(self.path, False)
+        # (spec, mount point, mount point as listed in /proc/mounts), built
+        # once so mount() doesn't have to re-derive them on every call
+        self._targets = tuple(
+                (spec, chr_path, _escape_mount_path(os.fsencode(chr_path)))
+                for spec, chr_path in zip(self._spec, self.path.values()))
 
         self.mount()
 
@@ -112,23 +419,31 @@ class MagicMounts:
         Raises:
             MountError: An error occured while trying to mount chroot
         '''
-        for host_mnt, chr_path in self.path.items():
-            if is_mounted(chr_path):
-                continue
-            switch = self.profile['switch']
-            command = ['mount', switch]
-            if switch == '-o':
-                command.extend(['bind', host_mnt, chr_path])
-            elif switch == '-t':
-                command.extend([host_mnt, f'{host_mnt}-chroot', chr_path])
-            else:
-                raise MountError(
-                        f"Unknown switch passed to mount() method: '{switch}'.")
+        with _mount_lock():
+            mounted = _snapshot_mounts()
             try:
-                subprocess.run(command, check=True)
-                self.mounted[host_mnt] = True
-            except subprocess.CalledProcessError as e:
-                raise MountError(*e.args) from e
+                for spec, chr_path, escaped_path in self._targets:
+                    name = spec.source
+                    # mount(2) happily stacks a second filesystem on top of
+                    # an existing mount rather than failing, so we still need
+                    # to check the snapshot first
+                    if escaped_path in mounted:
+                        continue
+                    if spec.kind == MOUNT_BIND:
+                        self.mounted[name] = _mount(
+                                join('/', name), chr_path, None, MS_BIND)
+                    else:
+                        self.mounted[name] = _mount(
+                                f'{name}-chroot', chr_path, name, 0)
+            except BaseException:
+                # roll back a partial mount, nothing else holds a reference
+                # which could un-mount it later. This is best effort, the
+                # original error is the one worth reporting
+                try:
+                    self.umount()
+                except MountError as e:
+                    debug('chroot.mount (rollback) =>', e)
+                raise
 
     def umount(self) -> None:
         ''' un-mount this chroot
@@ -136,59 +451,100 @@ class MagicMounts:
         Raises:
             MountError: An error occured while trying to un-mount chroot
         '''
-        command = ['umount', '-f']
-        for mount in self.mounted.keys():
-            if self.mounted[mount]:
-                subprocess.run([*command, self.path[mount]])
-                self.mounted[mount] = False
-
-    def __del__(self) -> None:
+        # un-mount in reverse order so nested mounts (e.g. dev/pts) are
+        # released before their parents
+        for name in reversed(self.mounted):
+            if not self.mounted[name]:
+                continue
+            chr_path = self.path[name]
+            # MNT_FORCE as the old `umount -f` did
+            err = _sys_umount2(os.fsencode(chr_path), MNT_FORCE | MNT_DETACH)
+            if err:
+                debug('chroot.umount =>', chr_path, os.strerror(err))
+                # EINVAL/ENOENT: not mounted (any more) or gone altogether
+                if err not in (errno.EINVAL, errno.ENOENT):
+                    raise MountError(
+                            err, f'failed to un-mount {chr_path!r}: '
+                                 f'{os.strerror(err)}')
+            self.mounted[name] = False
+
+    def __enter__(self) -> 'MagicMounts':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
         self.umount()
 
 
 class Chroot:
     '''represents a chroot on your system that you can run commands inside.
-    This class automatically attempts to mount the given chroot.
+    This class automatically attempts to mount the given chroot, the first time
+    a command is run in it (or when entering a `with` block).
 
     Example usage:
 
-        >>> foo = Chroot('/path/to/chroot', { 'ENVVAR': 'bar' })
-        >>> assert 'ENVVAR=bar' in foo.run(['env'], text=True).stdout
+        >>> with Chroot('/path/to/chroot', { 'ENVVAR': 'bar' }) as foo:
+        >>>     assert 'ENVVAR=bar' in foo.run(['env'], text=True).stdout
+
+    The chroot is un-mounted when the `with` block exits; when not used as a
+    context manager call `magicmounts.umount()` once finished with it.
     '''
     def __init__(
             self, newroot: AnyPath,
             environ: Optional[Dict[str, str]] = None,
-            mnt_profile: Optional[Dict[str, str]] = None):
-
-        if environ is None:
-            environ = {}
-        self.environ = {
-            'HOME': '/root',
-            'TERM': os.environ['TERM'],
-            'LC_ALL': 'C',
-            'PATH': "/usr/local/sbin:/usr/local/bin:/sbin:/bin:/usr/bin:/usr/sbin"
-        }
-        self.environ.update(environ)
+            mnt_profile: Optional[Mapping[str, str]] = None):
+
+        self.environ = {**_BASE_ENV, **(environ or {})}
         self.profile = MNT_DEFAULT if not mnt_profile else mnt_profile
 
-        self.path: str = realpath(os.fspath(newroot))
-        self.magicmounts = MagicMounts(self.profile, self.path)
+        # relative paths are made absolute first so the cache isn't tied to
+        # the current working directory
+        self.path: str = _resolve(abspath(os.fspath(newroot)))
+        self._chroot_prefix = [_CHROOT_BIN, self.path]
+
+    @functools.cached_property
+    def magicmounts(self) -> MagicMounts:
+        ''' mounts of this chroot, mounted on first access '''
+        return MagicMounts(self.profile, self.path)
+
+    def _ensure_mounted(self) -> None:
+        # accessing the cached property is what mounts the chroot
+        _ = self.magicmounts
+
+    def __enter__(self) -> 'Chroot':
+        self._ensure_mounted()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        # nothing to un-mount if nothing ever needed mounting; dropping the
+        # cached mounts means the next use of this chroot mounts it again
+        if 'magicmounts' in self.__dict__:
+            self.__dict__.pop('magicmounts').umount()
+
+    def _check_command(self, commands: Sequence[str]) -> None:
+        if not _FORBIDDEN.isdisjoint(commands):
+            raise ChrootError("Output redirects and pipes not supported in "
+                              f"fab-chroot (command: `{commands}')")
+
+    def _prepare_command_direct(self, command: List[str]) -> List[str]:
+        ''' build argv which has chroot exec the command itself, with no
+        intermediate shell '''
+        try:
+            self._check_command(command)
+            for arg in command:
+                if not isinstance(arg, (str, bytes, os.PathLike)):
+                    raise TypeError(f'expected str, bytes or os.PathLike '
+                                    f'argument, not {type(arg).__name__}')
+        except TypeError as e:
+            raise ChrootError(f'failed to prepare command {command!r} for chroot') from e
+        return self._chroot_prefix + command
 
     def _prepare_command(self, *commands: str) -> List[str]:
-        if '>' in commands or '<' in commands or '|' in commands:
-            raise ChrootError("Output redirects and pipes not supported in"
-                              f"fab-chroot (command: `{commands}')")
-        quoted_commands = []
-        for command in commands:
-            try:
-                quoted_commands.append(shlex.quote(command))
-            except TypeError as e:
-                raise ChrootError(f'failed to prepare command {command!r} for chroot') from e
-        return [
-            'chroot', self.path,
-            'sh', '-c',
-            ' '.join(quoted_commands)
-        ]
+        self._check_command(commands)
+        try:
+            joined = _shell_join(commands)
+        except TypeError as e:
+            raise ChrootError(f'failed to prepare command {commands!r} for chroot') from e
+        return self._chroot_prefix + ['sh', '-c', joined]
 
     def system(self, command: Optional[str] = None) -> int:
         """execute system command in chroot
@@ -208,13 +564,18 @@ class Chroot:
             FileNotFoundError: chroot program doesn't exist
         """
 
-        debug('chroot.system (args) => \x1b[34m', repr(command), '\x1b[0m')
-        command_chroot = ['chroot', self.path, '/bin/bash']
+        if _DEBUG:
+            debug('chroot.system (args) => \x1b[34m', repr(command), '\x1b[0m')
+        self._ensure_mounted()
+        command_chroot = [_CHROOT_BIN, self.path, '/bin/bash']
         if command:
             command_chroot.extend(['-c', command])
         return subprocess.run(command_chroot, env=self.environ).returncode
 
-    def run(self, command: str, *args: Any, **kwargs: Any) -> subprocess.CompletedProcess:
+    def run(
+            self, command: Union[str, Iterable[str]], *args: Any,
+            shell: bool = False,
+            **kwargs: Any) -> subprocess.CompletedProcess:
         """execute system command in chroot
 
         roughly analagous to `subprocess.run` except within the context of a
@@ -222,9 +583,12 @@ class Chroot:
 
         Args:
             command: command to run inside a chroot followed by args as a list
-                e.g. ``['ls', '-la', '/tmp']``
+                e.g. ``['ls', '-la', '/tmp']``, or as a string which will be
+                split shell-style (e.g. ``'ls -la /tmp'``)
 
             *args: forwarded to subprocess.run
+            shell: run the command via `sh -c` inside the chroot rather than
+                having chroot exec it directly
             **kwargs: forwarded to subprocess.run
 
 
@@ -239,7 +603,14 @@ class Chroot:
             CalledProcessError: check=True was passed in kwargs and
                 exitcode != 0
         """
-        debug('chroot.run (args) => \x1b[34m', repr(command), '\x1b[0m')
-        cmd = self._prepare_command(*command)
-        debug('chroot.run (prepared cmd) => \x1b[33m', repr(cmd), '\x1b[0m')
+        if _DEBUG:
+            debug('chroot.run (args) => \x1b[34m', repr(command), '\x1b[0m')
+        argv = _command_argv(command)
+        if shell:
+            cmd = self._prepare_command(*argv)
+        else:
+            cmd = self._prepare_command_direct(argv)
+        if _DEBUG:
+            debug('chroot.run (prepared cmd) => \x1b[33m', repr(cmd), '\x1b[0m')
+        self._ensure_mounted()
         return subprocess.run(cmd, env=self.environ, *args, **kwargs)
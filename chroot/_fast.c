@@ -0,0 +1,241 @@
+/*
+ * Copyright (c) 2021 TurnkeyLinux <admin@turnkeylinux.org>
+ *
+ * turnkey-chroot is open source software; you can redistribute it and/or
+ * modify it under the terms of the GNU General Public License as
+ * published by the Free Software Foundation; either version 3 of the
+ * License, or (at your option) any later version.
+ *
+ * Optional C implementations of the mount primitives used by the `chroot`
+ * package. Each mirrors the ctypes fallback of the same name in
+ * chroot/__init__.py (`_ctypes_mount`, `_ctypes_umount2` and
+ * `_ctypes_probe_mount_point`).
+ */
+
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+
+#include <errno.h>
+#include <fcntl.h>
+#include <limits.h>
+#include <stdint.h>
+#include <string.h>
+#include <sys/mount.h>
+#include <sys/syscall.h>
+#include <unistd.h>
+
+#ifndef SYS_openat2
+#define SYS_openat2 437
+#endif
+
+#ifndef RESOLVE_NO_XDEV
+#define RESOLVE_NO_XDEV 0x01
+#endif
+
+/* struct open_how from <linux/openat2.h> (not present in older headers) */
+struct chroot_open_how {
+    uint64_t flags;
+    uint64_t mode;
+    uint64_t resolve;
+};
+
+/* like PyUnicode_FSConverter (bytes/str/PathLike -> bytes), but also
+ * accepts None, converting it to NULL */
+static int
+fs_converter_or_none(PyObject *arg, void *addr)
+{
+    if (arg == NULL) {
+        /* cleanup call */
+        Py_CLEAR(*(PyObject **)addr);
+        return 1;
+    }
+    if (arg == Py_None) {
+        *(PyObject **)addr = NULL;
+        return 1;
+    }
+    return PyUnicode_FSConverter(arg, addr);
+}
+
+PyDoc_STRVAR(fast_mount_doc,
+"mount(source, target, fstype, flags) -> int\n\n"
+"Call mount(2), returns 0 or an errno value. fstype may be None.");
+
+static PyObject *
+fast_mount(PyObject *self, PyObject *const *args, Py_ssize_t nargs)
+{
+    PyObject *source = NULL, *target = NULL, *fstype = NULL;
+    unsigned long flags;
+    int rc, err = 0;
+
+    if (nargs != 4) {
+        PyErr_Format(PyExc_TypeError,
+                     "mount() takes exactly 4 arguments (%zd given)", nargs);
+        return NULL;
+    }
+    flags = PyLong_AsUnsignedLong(args[3]);
+    if (flags == (unsigned long)-1 && PyErr_Occurred())
+        return NULL;
+    if (!PyUnicode_FSConverter(args[0], &source))
+        goto out;
+    if (!PyUnicode_FSConverter(args[1], &target))
+        goto out;
+    if (!fs_converter_or_none(args[2], &fstype))
+        goto out;
+
+    Py_BEGIN_ALLOW_THREADS
+    rc = mount(PyBytes_AS_STRING(source), PyBytes_AS_STRING(target),
+               fstype ? PyBytes_AS_STRING(fstype) : NULL, flags, NULL);
+    if (rc != 0)
+        err = errno;
+    Py_END_ALLOW_THREADS
+
+    Py_XDECREF(source);
+    Py_XDECREF(target);
+    Py_XDECREF(fstype);
+    return PyLong_FromLong(err);
+
+out:
+    Py_XDECREF(source);
+    Py_XDECREF(target);
+    Py_XDECREF(fstype);
+    return NULL;
+}
+
+PyDoc_STRVAR(fast_umount2_doc,
+"umount2(target, flags) -> int\n\n"
+"Call umount2(2), returns 0 or an errno value.");
+
+static PyObject *
+fast_umount2(PyObject *self, PyObject *const *args, Py_ssize_t nargs)
+{
+    PyObject *target = NULL;
+    long flags;
+    int rc, err = 0;
+
+    if (nargs != 2) {
+        PyErr_Format(PyExc_TypeError,
+                     "umount2() takes exactly 2 arguments (%zd given)", nargs);
+        return NULL;
+    }
+    flags = PyLong_AsLong(args[1]);
+    if (flags == -1 && PyErr_Occurred())
+        return NULL;
+    if (flags < INT_MIN || flags > INT_MAX) {
+        PyErr_SetString(PyExc_OverflowError, "flags out of range");
+        return NULL;
+    }
+    if (!PyUnicode_FSConverter(args[0], &target))
+        return NULL;
+
+    Py_BEGIN_ALLOW_THREADS
+    rc = umount2(PyBytes_AS_STRING(target), (int)flags);
+    if (rc != 0)
+        err = errno;
+    Py_END_ALLOW_THREADS
+
+    Py_DECREF(target);
+    return PyLong_FromLong(err);
+}
+
+PyDoc_STRVAR(fast_probe_mount_point_doc,
+"probe_mount_point(path) -> bool or None\n\n"
+"Check whether an absolute, normalised path is a mount point with a single\n"
+"openat2(2) call using RESOLVE_NO_XDEV. Returns None if openat2 can't be\n"
+"used and the caller needs to fall back to reading /proc/mounts.");
+
+static PyObject *
+fast_probe_mount_point(PyObject *self, PyObject *arg)
+{
+    PyObject *path = NULL;
+    char *buf, *slash, *base;
+    const char *parent;
+    struct chroot_open_how how;
+    int dirfd, fd, err = 0;
+
+    if (!PyUnicode_FSConverter(arg, &path))
+        return NULL;
+    /* work on a copy, so the path can be split in place */
+    buf = PyMem_Malloc(PyBytes_GET_SIZE(path) + 1);
+    if (buf == NULL) {
+        Py_DECREF(path);
+        return PyErr_NoMemory();
+    }
+    memcpy(buf, PyBytes_AS_STRING(path), PyBytes_GET_SIZE(path) + 1);
+    Py_DECREF(path);
+
+    slash = strrchr(buf, '/');
+    if (slash == NULL || slash[1] == '\0') {
+        PyMem_Free(buf);
+        if (slash == NULL)
+            Py_RETURN_FALSE;  /* not absolute */
+        Py_RETURN_TRUE;  /* '/' */
+    }
+    base = slash + 1;
+    if (slash == buf) {
+        parent = "/";
+    } else {
+        *slash = '\0';
+        parent = buf;
+    }
+
+    memset(&how, 0, sizeof(how));
+    how.flags = O_PATH | O_NOFOLLOW | O_CLOEXEC;
+    how.resolve = RESOLVE_NO_XDEV;
+
+    Py_BEGIN_ALLOW_THREADS
+    dirfd = open(parent, O_PATH | O_DIRECTORY | O_CLOEXEC);
+    if (dirfd < 0) {
+        err = errno;
+    } else {
+        fd = syscall(SYS_openat2, dirfd, base, &how, sizeof(how));
+        if (fd >= 0)
+            close(fd);
+        else
+            err = errno;
+        close(dirfd);
+    }
+    Py_END_ALLOW_THREADS
+
+    PyMem_Free(buf);
+    if (dirfd < 0) {
+        if (err == ENOENT || err == ENOTDIR)
+            Py_RETURN_FALSE;
+        /* e.g. EACCES or ELOOP, let the caller check /proc/mounts instead */
+        Py_RETURN_NONE;
+    }
+    if (err == 0)
+        Py_RETURN_FALSE;
+    if (err == EXDEV)
+        Py_RETURN_TRUE;
+    if (err == ENOENT || err == ENOTDIR)
+        Py_RETURN_FALSE;
+    Py_RETURN_NONE;
+}
+
+static PyMethodDef fast_methods[] = {
+    {"mount", (PyCFunction)(void(*)(void))fast_mount, METH_FASTCALL,
+     fast_mount_doc},
+    {"umount2", (PyCFunction)(void(*)(void))fast_umount2, METH_FASTCALL,
+     fast_umount2_doc},
+    {"probe_mount_point", fast_probe_mount_point, METH_O,
+     fast_probe_mount_point_doc},
+    {NULL, NULL, 0, NULL}
+};
+
+static struct PyModuleDef fast_module = {
+    PyModuleDef_HEAD_INIT,
+    "chroot._fast",
+    "C implementations of the chroot mount primitives",
+    -1,
+    fast_methods,
+    NULL,
+    NULL,
+    NULL,
+    NULL,
+};
+
+PyMODINIT_FUNC
+PyInit__fast(void)
+{
+    return PyModule_Create(&fast_module);
+}
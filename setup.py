@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 
-from distutils.core import setup
+from setuptools import setup, Extension
 
 setup(
     name="turnkey-chroot",
@@ -9,4 +9,8 @@ setup(
     author_email="stefan@turnkeylinux.org",
     url="https://github.com/turnkeylinux/turnkey-chroot",
     packages=["chroot"],
+    ext_modules=[
+        # optional: the package falls back to ctypes if this can't be built
+        Extension("chroot._fast", sources=["chroot/_fast.c"], optional=True),
+    ],
 )